@@ -1,6 +1,25 @@
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Dict, List
 
+import numpy as np
+
 from models import Indicator, BlockIndex, EvaluationRequest, EvaluationResult
+from utils_numba import (
+    NUMBA_AVAILABLE,
+    PARALLEL_LOCK,
+    evaluate_batch_kernel,
+    evaluate_kernel,
+)
+
+
+# Blok kodlari va ularning massivlardagi tartib raqami
+BLOCK_ORDER = ("R", "P", "O", "I")
+BLOCK_CODES: Dict[str, int] = {code: i for i, code in enumerate(BLOCK_ORDER)}
+
+# Sifat darajalari (classify_level uchun jadval)
+LEVELS = ("Past", "O‘rtacha", "Yuqori", "Juda yuqori")
 
 
 # ===========================
@@ -45,104 +64,134 @@ def classify_level(total_index: float) -> str:
       0.50 – 0.75  ->  "Yuqori"
       0.75 – 1.00  ->  "Juda yuqori"
     """
-    if total_index < 0.25:
-        return "Past"
-    elif total_index < 0.50:
-        return "O‘rtacha"
-    elif total_index < 0.75:
-        return "Yuqori"
-    else:
-        return "Juda yuqori"
-
+    # Diapazonlar teng (0.25) bo‘lgani uchun daraja = int(total_index * 4);
+    # 4 ga ko‘paytirish float uchun aniq, shuning uchun chegaralar siljimaydi
+    if 0.0 <= total_index < 1.0:
+        return LEVELS[int(total_index * 4)]
+    return LEVELS[0] if total_index < 0.0 else LEVELS[3]
 
-# ===========================
-#  Asosiy baholash funksiyasi
-# ===========================
 
-def evaluate(req: EvaluationRequest) -> EvaluationResult:
+def _evaluate_numpy(values, mins, maxs, weights, is_benefit, block_ids, alphas):
     """
-    Tashkilotning ilmiy faoliyati samaradorligini baholash.
+    utils_numba.evaluate_kernel ning NumPy'dagi vektorli varianti
+    (numba o‘rnatilmagan muhit uchun). Kirish va chiqish bir xil.
+    """
+    n_blocks = alphas.shape[0]
 
-    Kirish:
-      - req.indicators: ko‘rsatkichlar ro‘yxati (R, P, O, I bloklari bo‘yicha)
-      - req.block_weights: bloklar og‘irliklari (alpha_R, alpha_P, alpha_O, alpha_I)
+    # normalize() ning vektorli varianti
+    safe = maxs != mins
+    with np.errstate(invalid="ignore"):
+        z = np.where(safe, (values - mins) / np.where(safe, maxs - mins, 1.0), 0.0)
+    z = np.where(is_benefit | ~safe, z, 1.0 - z)
 
-    Chiqish:
-      - EvaluationResult:
-          * total_index – integral indeks
-          * blocks – blok indekslari
-          * level – sifat darajasi (Past, O‘rtacha, ...)
-          * weakest_block / strongest_block – eng zaif va eng kuchli bloklar
+    # max(0.0, min(1.0, z)) bilan aynan bir xil (np.clip dan farqli, NaN -> 1.0)
+    z = np.where(z < 1.0, z, 1.0)
+    z = np.where(z > 0.0, z, 0.0)
+
+    # Har bir blok bo‘yicha vaznlangan yig‘indilar
+    block_sum = np.bincount(block_ids, weights=z * weights, minlength=n_blocks)
+    weight_sum = np.bincount(block_ids, weights=weights, minlength=n_blocks)
+
+    block_values = np.divide(
+        block_sum, weight_sum, out=np.zeros(n_blocks), where=weight_sum > 0
+    )
+    total = float(np.dot(alphas, block_values))
+
+    return z, block_values, total
+
+
+_evaluate_arrays = evaluate_kernel if NUMBA_AVAILABLE else _evaluate_numpy
+
+
+def _pack_request(req: EvaluationRequest):
+    """
+    So‘rovdagi ko‘rsatkichlarni ustunli (SoA) NumPy massivlariga yig‘ish.
+
+    Qaytaradi: (block_ids, arrays), bu yerda block_ids – blok indekslari
+    ro‘yxati, arrays – evaluate_kernel ga beriladigan massivlar korteji.
     """
+    indicators = req.indicators
+    n = len(indicators)
+
+    # Blok kodlari bir marta butun son indeksga o‘tkaziladi (R=0, P=1, O=2, I=3);
+    # keyingi guruhlash satr xeshlari emas, ro‘yxat indekslari orqali bajariladi
+    block_ids = [BLOCK_CODES.get(ind.block, -1) for ind in indicators]
+    if -1 in block_ids:
+        # Noto‘g‘ri blok kodi kiritilgan holat
+        bad = indicators[block_ids.index(-1)].block
+        raise ValueError(f"Noma'lum blok kodi: {bad}")
+
+    vals = np.fromiter((ind.value for ind in indicators), dtype=np.float64, count=n)
+    mins = np.fromiter((ind.min_value for ind in indicators), dtype=np.float64, count=n)
+    maxs = np.fromiter((ind.max_value for ind in indicators), dtype=np.float64, count=n)
+    weights = np.fromiter((ind.weight for ind in indicators), dtype=np.float64, count=n)
+    isben = np.fromiter((ind.is_benefit for ind in indicators), dtype=np.bool_, count=n)
+    blocks = np.array(block_ids, dtype=np.int8)
+
+    # Blok og‘irliklari BLOCK_ORDER tartibida: umumiy indeks = alphas · block_values
+    bw = req.block_weights
+    alphas = np.fromiter(
+        (getattr(bw, f"alpha_{code}") for code in BLOCK_ORDER),
+        dtype=np.float64,
+        count=len(BLOCK_ORDER),
+    )
 
-    # 1. Ko‘rsatkichlarni bloklar bo‘yicha guruhlash
-    block_groups: Dict[str, List[Indicator]] = {"R": [], "P": [], "O": [], "I": []}
+    return block_ids, (vals, mins, maxs, weights, isben, blocks, alphas)
+
+
+def _build_result(
+    req: EvaluationRequest, block_ids: List[int], z, block_arr, total_index_raw
+) -> EvaluationResult:
+    """
+    Sonli hisob-kitob natijalaridan EvaluationResult (Pydantic) modelini yig‘ish.
+    """
+    indicators = req.indicators
 
-    for ind in req.indicators:
-        if ind.block not in block_groups:
-            # Noto‘g‘ri blok kodi kiritilgan holat
-            raise ValueError(f"Noma'lum blok kodi: {ind.block}")
-        block_groups[ind.block].append(ind)
+    # Normallashtirilgan qiymatlarni bloklar bo‘yicha lug‘atlarga taqsimlash
+    norm_values: List[Dict[str, float]] = [{} for _ in BLOCK_ORDER]
+    for ind, b, zv in zip(indicators, block_ids, z.tolist()):
+        norm_values[b][ind.id] = zv
 
+    # Blok indekslarini Pydantic modellariga yig‘ish
     block_indices: List[BlockIndex] = []
     block_values: Dict[str, float] = {}
 
-    # 2. Har bir blok uchun vaznlangan indeksni hisoblash
-    for block_code, indicators in block_groups.items():
-        if not indicators:
+    for b, block_code in enumerate(BLOCK_ORDER):
+        block_index_value = float(block_arr[b])
+        block_values[block_code] = block_index_value
+
+        if not norm_values[b]:
             # Agar blok bo‘yicha ko‘rsatkich bo‘lmasa – indeks 0
-            block_values[block_code] = 0.0
             block_indices.append(
                 BlockIndex(block=block_code, value=0.0, indicators={})
             )
             continue
 
-        norm_values: Dict[str, float] = {}
-        block_sum = 0.0
-        weight_sum = 0.0
-
-        for ind in indicators:
-            z = normalize(ind)
-            norm_values[ind.id] = z
-            block_sum += z * ind.weight
-            weight_sum += ind.weight
-
-        block_index_value = block_sum / weight_sum if weight_sum > 0 else 0.0
-        block_values[block_code] = block_index_value
-
         block_indices.append(
             BlockIndex(
                 block=block_code,
                 value=round(block_index_value, 3),
-                indicators=norm_values,
+                indicators=norm_values[b],
             )
         )
 
-    # 3. Blok og‘irliklari asosida umumiy indeksni hisoblash
-    bw = req.block_weights
-
-    total_index_raw = (
-        bw.alpha_R * block_values.get("R", 0.0)
-        + bw.alpha_P * block_values.get("P", 0.0)
-        + bw.alpha_O * block_values.get("O", 0.0)
-        + bw.alpha_I * block_values.get("I", 0.0)
-    )
-
-    total_index = round(total_index_raw, 3)
+    total_index = round(float(total_index_raw), 3)
 
-    # 4. Sifat darajasi (klassifikatsiya)
+    # Sifat darajasi (klassifikatsiya)
     level = classify_level(total_index)
 
-    # 5. Eng kuchli va eng zaif bloklarni aniqlash
+    # Eng kuchli va eng zaif bloklarni aniqlash
     #    (faqat haqiqatan mavjud bloklar bo‘yicha)
-    if block_values:
-        weakest_block = min(block_values, key=block_values.get)
-        strongest_block = max(block_values, key=block_values.get)
-    else:
-        weakest_block = ""
-        strongest_block = ""
-
-    # 6. Natijani qaytarish
+    #    bitta o‘tishda; teng qiymatlarda min()/max() kabi birinchisi olinadi
+    weakest_block = strongest_block = ""
+    weakest_value = strongest_value = 0.0
+    for block_code, value in block_values.items():
+        if not weakest_block or value < weakest_value:
+            weakest_block, weakest_value = block_code, value
+        if not strongest_block or value > strongest_value:
+            strongest_block, strongest_value = block_code, value
+
+    # Natijani qaytarish
     return EvaluationResult(
         tashkilot=req.tashkilot,
         yil=req.yil,
@@ -152,3 +201,126 @@ def evaluate(req: EvaluationRequest) -> EvaluationResult:
         weakest_block=weakest_block or None,
         strongest_block=strongest_block or None,
     )
+
+
+# ===========================
+#  Asosiy baholash funksiyasi
+# ===========================
+
+def evaluate(req: EvaluationRequest) -> EvaluationResult:
+    """
+    Tashkilotning ilmiy faoliyati samaradorligini baholash.
+
+    Kirish:
+      - req.indicators: ko‘rsatkichlar ro‘yxati (R, P, O, I bloklari bo‘yicha)
+      - req.block_weights: bloklar og‘irliklari (alpha_R, alpha_P, alpha_O, alpha_I)
+
+    Chiqish:
+      - EvaluationResult:
+          * total_index – integral indeks
+          * blocks – blok indekslari
+          * level – sifat darajasi (Past, O‘rtacha, ...)
+          * weakest_block / strongest_block – eng zaif va eng kuchli bloklar
+    """
+
+    # 1. Ko‘rsatkichlarni ustunli (SoA) NumPy massivlariga yig‘ish
+    block_ids, arrays = _pack_request(req)
+
+    # 2. Sonli hisob-kitob: normalizatsiya, blok indekslari va umumiy indeks
+    #    (numba mavjud bo‘lsa – JIT yadro, aks holda NumPy varianti)
+    z, block_arr, total_index_raw = _evaluate_arrays(*arrays)
+
+    # 3. Natijani yig‘ib qaytarish (daraja, eng kuchli/zaif bloklar)
+    return _build_result(req, block_ids, z, block_arr, total_index_raw)
+
+
+def evaluate_batch(reqs: List[EvaluationRequest]) -> List[EvaluationResult]:
+    """
+    Bir nechta so‘rovni birdaniga baholash (/evaluate_batch, ommaviy import).
+
+    numba mavjud bo‘lsa, barcha so‘rovlar (B, max_n) o‘lchamli massivlarga
+    joylanadi va evaluate_batch_kernel ularni CPU yadrolari bo‘ylab parallel
+    hisoblaydi. Aks holda har bir so‘rov NumPy varianti bilan alohida hisoblanadi.
+    """
+    packed = [_pack_request(req) for req in reqs]
+
+    if not NUMBA_AVAILABLE or not packed:
+        outputs = [_evaluate_numpy(*arrays) for _, arrays in packed]
+    else:
+        n_req = len(packed)
+        counts = np.array([len(ids) for ids, _ in packed], dtype=np.int64)
+        width = max(int(counts.max()), 1)
+
+        # Bo‘sh katakchalar vazni 0 bo‘lgan qiymatlar bilan to‘ldiriladi
+        values = np.zeros((n_req, width))
+        mins = np.zeros((n_req, width))
+        maxs = np.ones((n_req, width))
+        weights = np.zeros((n_req, width))
+        is_benefit = np.ones((n_req, width), dtype=np.bool_)
+        block_ids = np.zeros((n_req, width), dtype=np.int8)
+        alphas = np.empty((n_req, len(BLOCK_ORDER)))
+
+        for r, (_, (v, mn, mx, w, isb, bids, alpha)) in enumerate(packed):
+            k = v.shape[0]
+            values[r, :k] = v
+            mins[r, :k] = mn
+            maxs[r, :k] = mx
+            weights[r, :k] = w
+            is_benefit[r, :k] = isb
+            block_ids[r, :k] = bids
+            alphas[r] = alpha
+
+        with PARALLEL_LOCK:
+            norm_values, block_values, totals = evaluate_batch_kernel(
+                values, mins, maxs, weights, is_benefit, block_ids, counts, alphas
+            )
+        outputs = [
+            (norm_values[r, : counts[r]], block_values[r], totals[r])
+            for r in range(n_req)
+        ]
+
+    return [
+        _build_result(req, block_ids, z, block_arr, total)
+        for req, (block_ids, _), (z, block_arr, total) in zip(reqs, packed, outputs)
+    ]
+
+
+# ===========================
+#  Natijalarni keshlash
+# ===========================
+
+# evaluate_cached() uchun: so‘rov xeshi -> natija (LRU tartibida)
+EVALUATE_CACHE_SIZE = 1024
+_evaluate_cache: "OrderedDict[bytes, EvaluationResult]" = OrderedDict()
+_evaluate_cache_lock = threading.Lock()
+
+
+def evaluate_cached(req: EvaluationRequest) -> EvaluationResult:
+    """
+    evaluate() ning keshlangan varianti (/evaluate endpointi uchun).
+
+    Admin panelda bir xil so‘rov (masalan, og‘irliklarni sozlab solishtirishda)
+    qayta-qayta yuborilishi mumkin. Kalit – so‘rov repr() idan olingan
+    blake2b xeshi (qat'iy o‘lchamli; repr float qiymatlarini, jumladan
+    NaN/Infinity ni ham aniq saqlaydi). Keshda bo‘lmasa, evaluate() mavjud
+    so‘rov obyekti bilan chaqiriladi. Kesh jarayon qayta ishga tushganda
+    tozalanadi.
+
+    Qaytarilgan EvaluationResult bir nechta chaqiruvchilar orasida umumiy –
+    uni o‘zgartirmaslik kerak.
+    """
+    key = hashlib.blake2b(repr(req).encode("utf-8"), digest_size=16).digest()
+
+    with _evaluate_cache_lock:
+        result = _evaluate_cache.get(key)
+        if result is not None:
+            _evaluate_cache.move_to_end(key)
+            return result
+
+    result = evaluate(req)
+
+    with _evaluate_cache_lock:
+        _evaluate_cache[key] = result
+        if len(_evaluate_cache) > EVALUATE_CACHE_SIZE:
+            _evaluate_cache.popitem(last=False)
+    return result
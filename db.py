@@ -1,5 +1,5 @@
 # db.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Oddiy variant: SQLite fayl
@@ -10,5 +10,22 @@ engine = create_engine(
     connect_args={"check_same_thread": False}  # SQLite uchun kerak
 )
 
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Har bir yangi SQLite ulanishi uchun PRAGMA sozlamalari:
+      - WAL jurnali: o‘qish va yozish bir-birini bloklamaydi
+      - synchronous=NORMAL: WAL rejimida har commit'da fsync qilinmaydi
+      - temp_store=MEMORY, mmap_size: vaqtinchalik jadvallar va o‘qish xotirada
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -1,22 +1,29 @@
 # main.py
-from typing import Dict
+import csv
+import os
+from typing import Dict, List
 from datetime import datetime
-from io import BytesIO
+from io import BytesIO, StringIO
 
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy import insert, inspect, select
 from sqlalchemy.orm import Session
 
 import openpyxl
+import orjson
 
 from db import SessionLocal, engine, Base
 from models import (
+    BLOCK_COLUMNS,
     EvaluationRequest,
+    EvaluationBatchRequest,
     EvaluationResult,
     Evaluation,  # SQLAlchemy ORM modeli
 )
-from core import evaluate as evaluate_core  # asosiy hisoblash funksiyasi
+from core import evaluate_cached as evaluate_core  # asosiy hisoblash funksiyasi
+from core import evaluate_batch as evaluate_batch_core
 
 
 # -----------------------------
@@ -25,6 +32,7 @@ from core import evaluate as evaluate_core  # asosiy hisoblash funksiyasi
 app = FastAPI(
     title="Tashkilotda ilmiy faoliyat samaradorligini baholash",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # static papkani ulash (index.html, admin.html, logo va boshqalar shu yerda)
@@ -34,6 +42,46 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 Base.metadata.create_all(bind=engine)
 
 
+def migrate_evaluations() -> None:
+    """
+    Oldin yaratilgan bazalarni joriy sxemaga keltirish.
+
+    create_all() mavjud jadvalga yangi ustun va indekslarni qo‘shmaydi:
+      - blok indekslari uchun r_index, p_index, o_index, i_index ustunlari
+        qo‘shiladi va eski JSON block_values ustunidan to‘ldiriladi;
+      - yetishmayotgan indekslar (masalan, ix_eval_yil_id) yaratiladi,
+        uning o‘rnini bosgan eski ix_evaluations_yil esa o‘chiriladi.
+    """
+    columns = {c["name"] for c in inspect(engine).get_columns("evaluations")}
+    missing = [col for col in BLOCK_COLUMNS.values() if col not in columns]
+
+    if missing:
+        with engine.begin() as conn:
+            for col in missing:
+                conn.exec_driver_sql(f"ALTER TABLE evaluations ADD COLUMN {col} FLOAT")
+            if "block_values" in columns:
+                assignments = ", ".join(
+                    f"{col} = json_extract(block_values, '$.{code}')"
+                    for code, col in BLOCK_COLUMNS.items()
+                    if col in missing
+                )
+                conn.exec_driver_sql(f"UPDATE evaluations SET {assignments}")
+
+    with engine.begin() as conn:
+        # Eski yakka yil indeksi: aks holda SQLite uni tanlab qoladi
+        # va jadval ikkala indeksni ham yangilab turadi
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_evaluations_yil")
+
+    for index in Evaluation.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+migrate_evaluations()
+
+# Katta ro‘yxatlarni bazadan o‘qishda bir martada olinadigan qatorlar soni
+YIELD_PER = 500
+
+
 # -----------------------------
 # DB sessiya dependency
 # -----------------------------
@@ -46,47 +94,41 @@ def get_db():
 
 
 # -----------------------------
-# Foydalanuvchi interfeysi – /
+# HTML sahifalar
 # -----------------------------
-@app.get("/", response_class=HTMLResponse)
-async def index():
+def html_page(path: str) -> FileResponse:
     """
-    Asosiy (user) sahifa – static/index.html ni beradi.
+    HTML faylni FileResponse orqali qaytaradi: fayl Python'da o‘qilmaydi
+    va dekodlanmaydi, balki to‘g‘ridan-to‘g‘ri (sendfile) yuboriladi.
     """
-    try:
-        # Asosiy variant – UTF-8
-        with open("static/index.html", encoding="utf-8") as f:
-            return f.read()
-    except UnicodeDecodeError:
-        # Agar tasodifan cp1251 yoki boshqa kodirovkada saqlangan bo‘lsa
-        with open("static/index.html", encoding="cp1251", errors="ignore") as f:
-            return f.read()
-    except FileNotFoundError:
+    if not os.path.isfile(path):
         raise HTTPException(
             status_code=500,
-            detail="static/index.html topilmadi. Iltimos, fayl joylashuvini va nomini tekshiring.",
+            detail=f"{path} topilmadi. Iltimos, fayl joylashuvini va nomini tekshiring.",
         )
+    return FileResponse(path, media_type="text/html; charset=utf-8")
+
+
+# -----------------------------
+# Foydalanuvchi interfeysi – /
+# -----------------------------
+@app.get("/", response_class=FileResponse)
+async def index():
+    """
+    Asosiy (user) sahifa – static/index.html ni beradi.
+    """
+    return html_page("static/index.html")
 
 
 # -----------------------------
 # Admin panel – /admin
 # -----------------------------
-@app.get("/admin", response_class=HTMLResponse)
+@app.get("/admin", response_class=FileResponse)
 async def admin_page():
     """
     Admin paneli uchun alohida sahifa – static/admin.html.
     """
-    try:
-        with open("static/admin.html", encoding="utf-8") as f:
-            return f.read()
-    except UnicodeDecodeError:
-        with open("static/admin.html", encoding="cp1251", errors="ignore") as f:
-            return f.read()
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=500,
-            detail="static/admin.html topilmadi. Iltimos, fayl joylashuvini va nomini tekshiring.",
-        )
+    return html_page("static/admin.html")
 
 
 # -----------------------------
@@ -101,47 +143,175 @@ def evaluate_endpoint(
     Frontenddan kelgan ma'lumotlarni qabul qiladi,
     algoritm bo‘yicha hisoblaydi va natijani DB ga yozib qo‘yadi.
     """
-    # 1) Asosiy hisob-kitob (core.py ichidagi evaluate_core)
+    # 1) Asosiy hisob-kitob (core.py ichidagi evaluate_core, natijalar keshlanadi)
     result: EvaluationResult = evaluate_core(req)
 
-    # 2) Blok indekslarini bazaga saqlash uchun lug‘at ko‘rinishiga keltiramiz
-    block_values: Dict[str, float] = {}
+    # 2) Blok indekslarini ustunlar bo‘yicha taqsimlaymiz
+    block_columns: Dict[str, float] = {}
     for block in result.blocks:
-        # block.block – "R", "P", "O", "I"
+        # block.block – "R", "P", "O", "I" -> r_index, p_index, ...
         # block.value – indeks qiymati
-        block_values[block.block] = block.value
+        block_columns[BLOCK_COLUMNS[block.block]] = block.value
 
     # 3) ORM obyektini yaratib bazaga yozamiz
     db_obj = Evaluation(
         tashkilot=result.tashkilot,
         yil=result.yil,
         total_index=result.total_index,
-        block_values=block_values,
+        **block_columns,
     )
+    # refresh() qilinmaydi: db_obj keyin ishlatilmaydi, qo‘shimcha SELECT keraksiz
     db.add(db_obj)
     db.commit()
-    db.refresh(db_obj)
 
     # 4) Frontendga pydantic model – EvaluationResult qaytadi
     return result
 
 
+# -----------------------------
+# Ommaviy hisoblash – /evaluate_batch
+# -----------------------------
+@app.post("/evaluate_batch", response_model=List[EvaluationResult])
+def evaluate_batch_endpoint(
+    reqs: EvaluationBatchRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Bir nechta so‘rovni (masalan, tarixiy ma'lumotlarni import qilishda)
+    bitta chaqiruvda hisoblaydi va barcha natijalarni bitta tranzaksiyada
+    ommaviy INSERT (executemany) bilan bazaga yozadi.
+    """
+    # 1) Barcha so‘rovlar bo‘yicha hisob-kitob (numba bo‘lsa – parallel)
+    results: List[EvaluationResult] = evaluate_batch_core(reqs)
+
+    # 2) ORM obyektlarisiz, lug‘atlar ro‘yxati ko‘rinishida bitta INSERT
+    if results:
+        db.execute(
+            insert(Evaluation),
+            [
+                {
+                    "tashkilot": r.tashkilot,
+                    "yil": r.yil,
+                    "total_index": r.total_index,
+                    **{BLOCK_COLUMNS[b.block]: b.value for b in r.blocks},
+                }
+                for r in results
+            ],
+        )
+        db.commit()
+
+    return results
+
+
 # -----------------------------
 # Tarixiy natijalar – /evaluations
 # -----------------------------
 @app.get("/evaluations")
-def list_evaluations(db: Session = Depends(get_db)):
+def list_evaluations():
     """
     Barcha saqlangan baholashlarni qaytaradi.
     Admin panel va foydalanuvchi interfeysidagi tahlil uchun ishlatiladi.
+
+    Natija JSON massiv ko‘rinishida oqim (stream) bilan yuboriladi:
+    qatorlar bazadan YIELD_PER tadan o‘qiladi, butun jadval xotiraga yuklanmaydi.
+    Qatorlar Pydantic/jsonable_encoder orqali emas, to‘g‘ridan-to‘g‘ri orjson
+    bilan seriyalanadi.
+    """
+    return StreamingResponse(
+        iter_evaluations_json(), media_type="application/json"
+    )
+
+
+def iter_evaluations_json():
+    """
+    /evaluations uchun JSON massivni qism-qism hosil qiluvchi generator.
+    Javob yuborilayotgan paytda ham kursor ochiq turishi kerak,
+    shuning uchun sessiya get_db() dan emas, shu yerning o‘zida ochiladi.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                Evaluation.id,
+                Evaluation.tashkilot,
+                Evaluation.yil,
+                Evaluation.total_index,
+                Evaluation.r_index,
+                Evaluation.p_index,
+                Evaluation.o_index,
+                Evaluation.i_index,
+            )
+            .order_by(Evaluation.yil, Evaluation.id)
+            .execution_options(yield_per=YIELD_PER)
+        )
+
+        # Javob formati o‘zgarmaydi: blok indekslari block_values lug‘atida
+        sep = b"["
+        for chunk in rows.partitions():
+            yield sep + b",".join(
+                orjson.dumps({
+                    "id": row.id,
+                    "tashkilot": row.tashkilot,
+                    "yil": row.yil,
+                    "total_index": row.total_index,
+                    "block_values": {
+                        "R": row.r_index,
+                        "P": row.p_index,
+                        "O": row.o_index,
+                        "I": row.i_index,
+                    },
+                })
+                for row in chunk
+            )
+            sep = b","
+        yield b"]" if sep == b"," else b"[]"
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Eksport uchun umumiy yordamchilar
+# -----------------------------
+# Admin paneldagi jadvalga mos ustunlar
+EXPORT_HEADERS = ["#", "Tashkilot", "Yil", "Umumiy indeks", "R", "P", "O", "I"]
+
+
+def export_query():
+    """
+    Eksport uchun so‘rov: faqat kerakli ustunlar (to‘liq ORM obyektlari
+    yaratilmaydi), qatorlar bazadan YIELD_PER tadan o‘qiladi.
     """
     return (
-        db.query(Evaluation)
+        select(
+            Evaluation.tashkilot,
+            Evaluation.yil,
+            Evaluation.total_index,
+            Evaluation.r_index,
+            Evaluation.p_index,
+            Evaluation.o_index,
+            Evaluation.i_index,
+        )
         .order_by(Evaluation.yil, Evaluation.id)
-        .all()
+        .execution_options(yield_per=YIELD_PER)
     )
 
 
+def export_row(idx: int, row) -> list:
+    """
+    export_query() qatorini EXPORT_HEADERS tartibidagi ro‘yxatga aylantiradi.
+    """
+    return [
+        idx,
+        row.tashkilot or "",
+        row.yil or "",
+        row.total_index,
+        row.r_index,
+        row.p_index,
+        row.o_index,
+        row.i_index,
+    ]
+
+
 # -----------------------------
 # Jadvalni Excelga eksport – /export/excel
 # -----------------------------
@@ -152,34 +322,19 @@ def export_excel(db: Session = Depends(get_db)):
     Admin paneldagi jadvalga mos ustunlar:
     #, Tashkilot, Yil, Umumiy indeks, R, P, O, I
     """
-    evaluations = (
-        db.query(Evaluation)
-        .order_by(Evaluation.yil, Evaluation.id)
-        .all()
-    )
+    evaluations = db.execute(export_query())
 
-    # Excel ishchi kitobi va varaq
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Baholashlar"
+    # Excel ishchi kitobi va varaq (write-only rejim: qatorlar
+    # xotirada katakchalar to‘ri sifatida saqlanmaydi, darhol XML ga yoziladi)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Baholashlar")
 
     # Sarlavha qatori
-    headers = ["#", "Tashkilot", "Yil", "Umumiy indeks", "R", "P", "O", "I"]
-    ws.append(headers)
+    ws.append(EXPORT_HEADERS)
 
     # Ma'lumotlarni yozish
     for idx, row in enumerate(evaluations, start=1):
-        bv = row.block_values or {}
-        ws.append([
-            idx,
-            row.tashkilot or "",
-            row.yil or "",
-            float(row.total_index) if row.total_index is not None else None,
-            float(bv.get("R", 0)) if bv.get("R") is not None else None,
-            float(bv.get("P", 0)) if bv.get("P") is not None else None,
-            float(bv.get("O", 0)) if bv.get("O") is not None else None,
-            float(bv.get("I", 0)) if bv.get("I") is not None else None,
-        ])
+        ws.append(export_row(idx, row))
 
     # Faylni xotirada saqlaymiz
     stream = BytesIO()
@@ -195,3 +350,53 @@ def export_excel(db: Session = Depends(get_db)):
             "Content-Disposition": f"attachment; filename={filename}"
         },
     )
+
+
+# -----------------------------
+# Jadvalni CSV ga eksport – /export/csv
+# -----------------------------
+@app.get("/export/csv")
+def export_csv():
+    """
+    Barcha baholash natijalarini CSV fayl ko‘rinishida eksport qiladi.
+    Ustunlar /export/excel bilan bir xil.
+
+    XLSX (siqilgan XML) dan farqli ravishda fayl oldindan yig‘ilmaydi:
+    qatorlar bazadan o‘qilishi bilan javobga oqim (stream) bo‘lib yoziladi.
+    """
+    filename = f"ilmiy_baholash_{datetime.now():%Y%m%d_%H%M%S}.csv"
+
+    return StreamingResponse(
+        iter_evaluations_csv(),
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}"
+        },
+    )
+
+
+def iter_evaluations_csv():
+    """
+    /export/csv uchun CSV qatorlarini qism-qism hosil qiluvchi generator.
+    Sessiya iter_evaluations_json() dagi kabi shu yerning o‘zida ochiladi.
+    """
+    buf = StringIO()
+    writer = csv.writer(buf)
+
+    # BOM – Excel faylni UTF-8 sifatida to‘g‘ri ochishi uchun
+    buf.write("\ufeff")
+    writer.writerow(EXPORT_HEADERS)
+    yield buf.getvalue()
+
+    db = SessionLocal()
+    try:
+        idx = 0
+        for chunk in db.execute(export_query()).partitions():
+            buf.seek(0)
+            buf.truncate()
+            for row in chunk:
+                idx += 1
+                writer.writerow(export_row(idx, row))
+            yield buf.getvalue()
+    finally:
+        db.close()
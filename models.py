@@ -2,7 +2,7 @@ from typing import List, Dict, Literal, Optional
 
 from pydantic import BaseModel, Field, validator
 
-from sqlalchemy import Column, Integer, String, Float, JSON
+from sqlalchemy import Column, Integer, String, Float, Index
 from db import Base
 
 
@@ -76,6 +76,10 @@ class EvaluationRequest(BaseModel):
     block_weights: BlockWeights
 
 
+# /evaluate_batch endpointiga keladigan so‘rov: EvaluationRequest lar ro‘yxati
+EvaluationBatchRequest = List[EvaluationRequest]
+
+
 class BlockIndex(BaseModel):
     """
     Bitta blok (R, P, O yoki I) bo‘yicha integral indeks.
@@ -113,6 +117,15 @@ class EvaluationResult(BaseModel):
 #  SQLAlchemy ORM modeli
 # ===========================
 
+# Blok kodi -> evaluations jadvalidagi ustun nomi
+BLOCK_COLUMNS: Dict[str, str] = {
+    "R": "r_index",
+    "P": "p_index",
+    "O": "o_index",
+    "I": "i_index",
+}
+
+
 class Evaluation(Base):
     """
     Ma'lumotlar bazasida saqlanadigan baholash yozuvi.
@@ -123,16 +136,24 @@ class Evaluation(Base):
       - tashkilot: tashkilot nomi
       - yil: baholash yili
       - total_index: umumiy indeks S
-      - block_values: JSON ko‘rinishida blok indekslari, masalan:
-            {"R": 0.45, "P": 0.62, "O": 0.71, "I": 0.38}
+      - r_index, p_index, o_index, i_index: R, P, O, I blok indekslari
+        (avval JSON ko‘rinishidagi block_values ustunida saqlangan)
     """
     __tablename__ = "evaluations"
+    __table_args__ = (
+        # Ro‘yxat va eksport "ORDER BY yil, id" bo‘yicha o‘qiladi –
+        # kompozit indeks qo‘shimcha saralashni (filesort) olib tashlaydi
+        Index("ix_eval_yil_id", "yil", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tashkilot = Column(String, index=True)
-    yil = Column(Integer, index=True)
+    yil = Column(Integer)
     total_index = Column(Float)
-    block_values = Column(JSON)  # {"R":0.25, "P":0.5, "O":0.7, "I":0.3}
+    r_index = Column(Float)
+    p_index = Column(Float)
+    o_index = Column(Float)
+    i_index = Column(Float)
 
     def __repr__(self) -> str:
         return (
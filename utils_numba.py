@@ -0,0 +1,133 @@
+# utils_numba.py
+"""
+Baholash algoritmining JIT-kompilyatsiya qilinadigan (numba) yadrosi.
+
+numba o‘rnatilmagan muhitda njit() hech narsa qilmaydigan dekoratorga,
+prange esa oddiy range ga aylanadi va NUMBA_AVAILABLE = False bo‘ladi –
+bu holda core.py NumPy'ning vektorli variantidan foydalanadi.
+"""
+import threading
+
+import numpy as np
+
+# evaluate_batch_kernel ni bir vaqtda faqat bitta oqim ishga tushirishi uchun
+PARALLEL_LOCK = threading.Lock()
+
+try:
+    import numba
+    from numba import njit, prange
+
+    # Parallel yadro FastAPI threadpool oqimlaridan chaqiriladi: TBB qatlami
+    # asosiy bo‘lmagan oqimdan ishga tushirilganda jarayon yopilishida osilib
+    # qoladi, shuning uchun birinchi navbatda OpenMP tanlanadi
+    numba.config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba ixtiyoriy bog‘liqlik
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """
+        numba.njit o‘rnini bosuvchi "bo‘sh" dekorator:
+        @njit va @njit(cache=True, ...) ikkala shaklini ham qo‘llab-quvvatlaydi.
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+@njit(cache=True)
+def evaluate_kernel(values, mins, maxs, weights, is_benefit, block_ids, alphas):
+    """
+    Bitta so‘rov bo‘yicha sonli hisob-kitob.
+
+    Kirish (barchasi bir o‘lchamli massivlar, uzunligi n):
+      - values, mins, maxs, weights: float64
+      - is_benefit: bool
+      - block_ids: int8 (R=0, P=1, O=2, I=3)
+      - alphas: float64, bloklar og‘irliklari (uzunligi 4)
+
+    Chiqish:
+      - norm_values: har bir ko‘rsatkichning normallashtirilgan qiymati
+      - block_values: bloklar indekslari (yaxlitlanmagan)
+      - total: umumiy integral indeks (yaxlitlanmagan)
+    """
+    n = values.shape[0]
+    n_blocks = alphas.shape[0]
+
+    norm_values = np.empty(n, dtype=np.float64)
+    block_sum = np.zeros(n_blocks, dtype=np.float64)
+    weight_sum = np.zeros(n_blocks, dtype=np.float64)
+
+    for i in range(n):
+        if maxs[i] == mins[i]:
+            z = 0.0
+        else:
+            z = (values[i] - mins[i]) / (maxs[i] - mins[i])
+            if not is_benefit[i]:
+                z = 1.0 - z
+            # max(0.0, min(1.0, z)) bilan aynan bir xil (NaN -> 1.0)
+            if not z < 1.0:
+                z = 1.0
+            if not z > 0.0:
+                z = 0.0
+
+        norm_values[i] = z
+        b = block_ids[i]
+        block_sum[b] += z * weights[i]
+        weight_sum[b] += weights[i]
+
+    block_values = np.zeros(n_blocks, dtype=np.float64)
+    total = 0.0
+    for b in range(n_blocks):
+        if weight_sum[b] > 0.0:
+            block_values[b] = block_sum[b] / weight_sum[b]
+        total += alphas[b] * block_values[b]
+
+    return norm_values, block_values, total
+
+
+@njit(cache=True, parallel=True)
+def evaluate_batch_kernel(
+    values, mins, maxs, weights, is_benefit, block_ids, counts, alphas
+):
+    """
+    Bir nechta so‘rovni parallel hisoblash (har bir so‘rov mustaqil).
+
+    Kirish: (B, max_n) o‘lchamli massivlar – r-qatorda r-so‘rovning birinchi
+    counts[r] ta ko‘rsatkichi joylashgan, qolgan katakchalar hisobga olinmaydi;
+    alphas – (B, 4) o‘lchamli bloklar og‘irliklari.
+
+    Chiqish: norm_values (B, max_n), block_values (B, 4), totals (B,).
+    prange iteratsiyalari GIL siz, CPU yadrolari bo‘ylab taqsimlanadi.
+
+    workqueue qatlami bir vaqtda bir nechta oqimdan chaqirilishini
+    ko‘tarmaydi – chaqiruvchi tomonda PARALLEL_LOCK dan foydalaning.
+    """
+    n_req = values.shape[0]
+
+    norm_values = np.zeros(values.shape, dtype=np.float64)
+    block_values = np.zeros(alphas.shape, dtype=np.float64)
+    totals = np.zeros(n_req, dtype=np.float64)
+
+    for r in prange(n_req):
+        k = counts[r]
+        z, bv, total = evaluate_kernel(
+            values[r, :k],
+            mins[r, :k],
+            maxs[r, :k],
+            weights[r, :k],
+            is_benefit[r, :k],
+            block_ids[r, :k],
+            alphas[r],
+        )
+        norm_values[r, :k] = z
+        block_values[r, :] = bv
+        totals[r] = total
+
+    return norm_values, block_values, totals